@@ -45,8 +45,23 @@ Paramètres CLI importants
 from __future__ import annotations
 import argparse, re, sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+# Copy-on-Write : les copies défensives deviennent inutiles (les écritures déclenchent une
+# copie paresseuse de la seule colonne touchée). Toujours actif à partir de pandas 3.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+
+# --- Dépendance optionnelle : PyArrow (lecture CSV plus rapide + sortie Parquet) -----------------
+# Sans PyArrow, le script reste fonctionnel avec le moteur CSV par défaut de pandas.
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except Exception:
+    HAS_PYARROW = False
+
 
 # --- Listes de référence pour classer les items -------------------------------------------------
 # Ces listes servent à :
@@ -60,6 +75,13 @@ ATOMIC_LIST = ["Asses","Buffalo","Camels","Swine, breeding","Swine, market","Tur
 "Ducks","Goats","Horses","Sheep"]
 
 
+# Classification item_kind précalculée une fois (libellé minuscule → catégorie) ;
+# tout libellé hors listes est considéré « atomic ».
+KIND_MAP = {**{x.lower(): "All" for x in ALL_ANIMALS_LIST},
+            **{x.lower(): "aggregated" for x in AGGREGATE_LIST},
+            **{x.lower(): "atomic" for x in ATOMIC_LIST}}
+
+
 # Items à exclure explicitement (libellés trop génériques ou vides)
 EXCLUDE_ITEMS = {s.lower() for s in ["Chickens","Mules and hinnies","(blank)",""]}
 
@@ -69,4 +91,285 @@ EU = {"Austria","Belgium","Bulgaria","Croatia","Cyprus","Czechia","Czech Republi
 "Finland","France","Germany","Greece","Hungary","Ireland","Italy","Latvia","Lithuania","Luxembourg",
 "Malta","Netherlands","Poland","Portugal","Romania","Slovakia","Slovenia","Spain","Sweden"}
 EEA_PLUS_UK = EU.union({"Iceland","Liechtenstein","Norway","United Kingdom","UK"})
-main()
+EUROPE_WIDE = EEA_PLUS_UK.union({"Albania","Andorra","Belarus","Bosnia and Herzegovina","Moldova","Monaco",
+"Montenegro","North Macedonia","Russia","San Marino","Serbia","Switzerland","Ukraine"})
+
+
+# --- PRG / GWP (conversion CH4 et N2O vers CO2e, en kt) -----------------------------------------
+GWP_SETS = {
+    "AR4":       {"CH4": 25.0,  "N2O": 298.0},
+    "AR5":       {"CH4": 28.0,  "N2O": 265.0},
+    "AR6_NOCCF": {"CH4": 27.2,  "N2O": 273.0},
+    "AR6_CCF":   {"CH4": 29.8,  "N2O": 273.0},
+}
+
+
+# --- Poids LSU (Livestock Units) par espèce, appliqués aux Stocks -------------------------------
+LSU_WEIGHTS_DEFAULT = {
+    "cattle, dairy": 1.0, "cattle, non-dairy": 1.0, "cattle": 0.8,
+    "buffalo": 1.0, "horses": 0.8, "mules and asses": 1.0, "asses": 1.0,
+    "camels": 1.0, "camels and llamas": 1.0,
+    "swine": 0.3, "swine, breeding": 0.3, "swine, market": 0.3,
+    "sheep": 0.1, "goats": 0.1, "sheep and goats": 0.1,
+    "chickens, broilers": 0.01, "chickens, layers": 0.01,
+    "ducks": 0.01, "turkeys": 0.01, "poultry birds": 0.01,
+}
+
+
+# --- Normalisation des libellés -----------------------------------------------------------------
+def canonical_item(x: str) -> str:
+    """Canonicalise un libellé d'item (bovins : priorité au non-laitier)."""
+    s = re.sub(r"\s+", " ", str(x).strip())
+    low = s.lower().replace("non dairy", "non-dairy")
+    if re.search(r"cattle|bovine", low):
+        if re.search(r"\bnon-?dairy\b|\bother\b", low):
+            return "Cattle, non-dairy"
+        if re.search(r"\bdairy\b", low):
+            return "Cattle, dairy"
+        return "Cattle"
+    return s
+
+
+def canonicalize_items(s: pd.Series) -> pd.Series:
+    """Version vectorisée de `canonical_item` : masques booléens calculés une fois
+    puis affectation des libellés canoniques via `np.select` (passes C, pas de boucle Python)."""
+    stripped = s.astype(str).str.strip()
+    low = (stripped.str.lower()
+                   .str.replace("non dairy", "non-dairy", regex=False)
+                   .str.replace(r"\s+", " ", regex=True))
+    is_cattle = low.str.contains("cattle|bovine", regex=True)
+    is_nd = low.str.contains(r"\bnon-?dairy\b|\bother\b", regex=True)
+    is_d = low.str.contains(r"\bdairy\b", regex=True)
+    return pd.Series(
+        np.select(
+            [is_cattle & is_nd, is_cattle & is_d, is_cattle],
+            ["Cattle, non-dairy", "Cattle, dairy", "Cattle"],
+            default=stripped,
+        ),
+        index=s.index,
+    )
+
+
+# Motifs compilés une seule fois pour la normalisation vectorisée des éléments FAO.
+_RE_STOCK = re.compile(r"(?:^stocks?$|\bstock\b)", re.I)
+_RE_CH4 = re.compile(r"\b(?:ch4|methane)\b", re.I)
+_RE_N2O = re.compile(r"\b(?:n2o|nitrous)\b", re.I)
+
+
+def normalize_elements(s: pd.Series) -> pd.Series:
+    """Ramène les libellés `Element` FAO à 'Stocks', 'CH4' ou 'N2O' (NaN sinon) —
+    trois passes `str.contains` en C au lieu d'un `apply` ligne à ligne."""
+    low = s.astype(str).str.lower()
+    m_st = low.str.contains(_RE_STOCK)
+    m_ch = low.str.contains(_RE_CH4)
+    m_n2 = low.str.contains(_RE_N2O)
+    norm = pd.Series(np.select([m_st, m_ch, m_n2], ["Stocks", "CH4", "N2O"], default=""),
+                     index=s.index)
+    return norm.mask(norm.eq(""))
+
+
+def default_lsu_weight(item: str) -> float:
+    """Poids LSU par défaut d'un item (0.0 si inconnu → exclu du calcul LSU)."""
+    return LSU_WEIGHTS_DEFAULT.get(canonical_item(item).lower(), 0.0)
+
+
+def split_cattle_rows(sb: pd.DataFrame, dairy_share: float) -> pd.DataFrame:
+    """Éclate les lignes génériques « Cattle » en dairy / non-dairy, **uniquement** pour les
+    couples (Area, Year) sans ligne atomique bovins déjà présente (garde-fou v4g)."""
+    # `Item` peut être catégoriel : on s'assure que les deux libellés cibles existent
+    # comme catégories avant de les affecter aux lignes éclatées.
+    if isinstance(sb["Item"].dtype, pd.CategoricalDtype):
+        missing = [l for l in ("Cattle, dairy", "Cattle, non-dairy")
+                   if l not in sb["Item"].cat.categories]
+        if missing:
+            sb = sb.assign(Item=sb["Item"].cat.add_categories(missing))
+    atomic_mask = sb["Item"].isin(["Cattle, dairy", "Cattle, non-dairy"])
+    cattle = sb[sb["Item"] == "Cattle"]
+    if cattle.empty:
+        return sb
+    # Test d'appartenance vectorisé sur les couples (Area, Year) : MultiIndex.isin
+    # remplace la boucle Python ligne à ligne (apply axis=1) et le set itertuples.
+    atomic_pairs = pd.MultiIndex.from_frame(sb.loc[atomic_mask, ["Area", "Year"]].drop_duplicates())
+    cattle_idx = pd.MultiIndex.from_frame(cattle[["Area", "Year"]])
+    to_split = cattle[~cattle_idx.isin(atomic_pairs)]
+    if to_split.empty:
+        return sb
+    dairy = to_split.copy()
+    dairy["Item"] = "Cattle, dairy"
+    dairy["Value"] = dairy["Value"] * dairy_share
+    nondairy = to_split.copy()
+    nondairy["Item"] = "Cattle, non-dairy"
+    nondairy["Value"] = nondairy["Value"] * (1.0 - dairy_share)
+    return pd.concat([sb, dairy, nondairy], ignore_index=True)
+
+
+def str2bool(v: str) -> bool:
+    return str(v).strip().lower() in {"1", "true", "yes", "oui", "y"}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Prétraitement élevage : CSV large FAO → CSV long préparé (v4g).")
+    ap.add_argument("--input", required=True, help="CSV brut (Area, Item, Element + colonnes Y...)")
+    ap.add_argument("--output", default=None, help="CSV de sortie (défaut : dossier de l'input)")
+    ap.add_argument("--gwp", default="AR5", choices=sorted(GWP_SETS), help="Jeu de PRG pour CH4/N2O → CO2e")
+    ap.add_argument("--split-cattle", default="true", help="true/false — éclater « Cattle » si possible")
+    ap.add_argument("--dairy-share", type=float, default=35.0, help="%% attribué au laitier lors de l'éclatement")
+    ap.add_argument("--only-livestock-total", default="true", help="true/false — CH4/N2O : ne garder que « Livestock total »")
+    ap.add_argument("--dask", default="false", help="true/false — lecture + filtrage parallèles par blocs via Dask (gros CSV)")
+    args = ap.parse_args()
+
+    inp = Path(args.input)
+    if not inp.exists():
+        sys.exit(f"Fichier introuvable : {inp}")
+    outp = Path(args.output) if args.output else inp.parent / "livestock_PREPARED_long.csv"
+    gwp = GWP_SETS[args.gwp]
+    dairy_share = args.dairy_share / 100.0
+
+    # --- Lecture + nettoyage des libellés --------------------------------------------------------
+    # Le moteur PyArrow parse en parallèle et stocke les chaînes en colonnes Arrow (~3x plus
+    # compactes que les objets Python) ; repli sur le moteur C par défaut sans PyArrow.
+    # Pour des CSV plus gros que la RAM, --dask lit et filtre par blocs de 128 Mo sur tous les
+    # cœurs avant de converger vers pandas pour la suite du pipeline (dépendance optionnelle).
+    if str2bool(args.dask):
+        try:
+            import dask.dataframe as dd
+        except ImportError:
+            sys.exit("--dask demandé mais Dask n'est pas installé : pip install \"dask[dataframe]\"")
+        ddf = dd.read_csv(inp, blocksize="128MB", assume_missing=True)
+        for c in ("Area", "Item", "Element"):
+            if c not in ddf.columns:
+                sys.exit(f"Colonne obligatoire absente du CSV brut : {c}")
+            ddf[c] = ddf[c].astype(str).str.strip()
+        df = ddf[~ddf["Item"].str.lower().isin(sorted(EXCLUDE_ITEMS))].compute()
+    elif HAS_PYARROW:
+        df = pd.read_csv(inp, engine="pyarrow", dtype_backend="pyarrow")
+    else:
+        df = pd.read_csv(inp)
+    for c in ("Area", "Item", "Element"):
+        if c not in df.columns:
+            sys.exit(f"Colonne obligatoire absente du CSV brut : {c}")
+        df[c] = df[c].astype(str).str.strip()
+
+    df = df[~df["Item"].str.lower().isin(EXCLUDE_ITEMS)]
+    df["Item"] = canonicalize_items(df["Item"])
+
+    # Dtypes étroits : libellés répétés en `category` (codes entiers — mémoire réduite et
+    # groupbys sur le chemin factorize rapide) ; années et valeurs en entiers/flottants courts.
+    for c in ("Area", "Item", "Element"):
+        df[c] = df[c].astype("category")
+
+    # --- Drapeaux régionaux (isin vectorisé contre les ensembles de référence) -------------------
+    df["region_EU"] = df["Area"].isin(EU)
+    df["region_EUEEAUK"] = df["Area"].isin(EEA_PLUS_UK)
+    df["region_europe"] = df["Area"].isin(EUROPE_WIDE)
+
+    # --- Passage au format long (une ligne par année) --------------------------------------------
+    # Assemblage NumPy direct plutôt que DataFrame.melt : melt recopie chaque colonne id
+    # len(year_cols) fois dans des tableaux objets (le plus gros pic mémoire du script).
+    # Ici on répète les codes catégoriels / booléens (petits entiers) et on aplatit le bloc
+    # de valeurs en une seule passe C-ordre.
+    # Détection des colonnes d'années (Y1961, Y1962, …) par regex sur l'index de colonnes :
+    # une seule passe en C plutôt qu'un test Python par nom de colonne.
+    year_cols = df.columns[df.columns.str.match(r"^Y\d{4}$")].tolist()
+    if not year_cols:
+        sys.exit("Aucune colonne d'années (Y...) détectée dans le CSV brut.")
+    k = len(year_cols)
+    years_arr = np.array([int(c[1:]) for c in year_cols], dtype=np.int16)
+    num = df[year_cols].apply(pd.to_numeric, errors="coerce")
+    cols = {c: pd.Categorical.from_codes(np.repeat(df[c].cat.codes.to_numpy(), k),
+                                         dtype=df[c].dtype)
+            for c in ("Area", "Item", "Element")}
+    for c in ("region_EU", "region_EUEEAUK", "region_europe"):
+        cols[c] = np.repeat(df[c].to_numpy(dtype=bool), k)
+    cols["Year"] = np.tile(years_arr, len(df))
+    cols["Value"] = num.to_numpy(dtype=np.float32, na_value=np.nan).reshape(-1)
+    long = pd.DataFrame(cols)
+    long = long.dropna(subset=["Value"])
+
+    # --- Normalisation des éléments (Stocks / CH4 / N2O) -----------------------------------------
+    long["ElementNorm"] = normalize_elements(long["Element"]).astype("category")
+    long = long.dropna(subset=["ElementNorm"])
+
+    # Pour CH4/N2O, option : ne garder que les lignes « Livestock total » (évite les doubles comptes
+    # entre fermentation entérique, gestion du fumier, etc. déjà sommés par la FAO).
+    if str2bool(args.only_livestock_total):
+        # Regex combinée (lookaheads « livestock » + « total ») : une seule passe str.contains
+        # en C au lieu de deux re.search Python par ligne.
+        lt_mask = long["Element"].str.contains(r"(?=.*livestock)(?=.*total)", case=False, regex=True)
+        long = long[(long["ElementNorm"] == "Stocks") | lt_mask]
+
+    # --- Éclatement « Cattle » (garde-fou : seulement si aucune ligne atomique) ------------------
+    if str2bool(args.split_cattle):
+        long = split_cattle_rows(long, dairy_share)
+
+    keys = ["Area", "Item", "Year", "region_EU", "region_EUEEAUK", "region_europe"]
+    prepared = []
+
+    # --- Stocks (regroupés pour supprimer d'éventuels doublons amont) ----------------------------
+    sb = long[long["ElementNorm"] == "Stocks"]
+    stocks_sum = sb.groupby(keys, as_index=False, observed=True, sort=False)["Value"].sum()
+    prepared.append(stocks_sum.assign(Metric="Stocks"))
+
+    # --- LSU (Stocks × poids par espèce, puis regroupé par (Area, Item, Year)) -------------------
+    # Noyau fusionné : items factorisés en codes entiers + petite table de poids (LUT), puis une
+    # seule passe NumPy `stocks * w[codes]` — pas de colonne intermédiaire ni de map par ligne.
+    codes, uniques = pd.factorize(sb["Item"])
+    weights = np.array([default_lsu_weight(u) for u in uniques], dtype=np.float64)
+    row_w = weights[codes]
+    has_w = row_w > 0.0
+    lsu = sb.loc[has_w, keys + ["Value"]]
+    lsu["Value"] = sb["Value"].to_numpy(dtype=np.float64)[has_w] * row_w[has_w]
+    lsu_sum = lsu.groupby(keys, as_index=False, observed=True, sort=False)["Value"].sum()
+    prepared.append(lsu_sum.assign(Metric="LSU"))
+
+    # --- CH4 / N2O → CO2e via PRG (les deux gaz dans une seule passe groupby) --------------------
+    gas = long[long["ElementNorm"].isin(["CH4", "N2O"])]
+    gas["Value"] = gas["Value"] * gas["ElementNorm"].map(gwp)
+    gas_sum = gas.groupby(keys + ["ElementNorm"], as_index=False, observed=True, sort=False)["Value"].sum()
+
+    # --- CH4_CO2e / N2O_CO2e / Total_CO2e depuis un unique pivot ---------------------------------
+    # Le résultat groupé est pivoté une seule fois : chaque métrique gaz est une colonne du pivot
+    # (NaN = gaz absent pour cette clé, retiré par dropna) et le total est la somme des colonnes.
+    # Ni re-sélection booléenne par gaz, ni merge externe, ni second groupby.
+    gas_wide = (gas_sum.set_index(keys + ["ElementNorm"])["Value"]
+                       .unstack("ElementNorm"))
+    for gas_col, metric in (("CH4", "CH4_CO2e"), ("N2O", "N2O_CO2e")):
+        if gas_col in gas_wide.columns:
+            prepared.append(gas_wide[gas_col].dropna().rename("Value")
+                                             .reset_index().assign(Metric=metric))
+    tot = gas_wide.fillna(0.0).sum(axis=1).rename("Value").reset_index()
+    prepared.append(tot.assign(Metric="Total_CO2e"))
+
+    out = pd.concat(prepared, ignore_index=True)
+    out["Metric"] = out["Metric"].astype("category")
+
+    # Pas de re-canonicalisation après concat : `Item` est canonicalisé une seule fois en amont
+    # (et l'éclatement bovin n'émet que des libellés déjà canoniques) ; l'exclusion des items
+    # génériques est faite dès la lecture — les repasser ici serait du travail dupliqué.
+
+    # --- Classification item_kind + drapeaux booléens (lookup dict vectorisé) --------------------
+    out["item_kind"] = out["Item"].str.lower().map(KIND_MAP).fillna("atomic").astype("category")
+    out["is_all"] = out["item_kind"].eq("All")
+    out["is_aggregated"] = out["item_kind"].eq("aggregated")
+    out["is_atomic"] = out["item_kind"].eq("atomic")
+
+    # Re-étiquetage régional (les clés ont pu changer lors de l'éclatement / concat).
+    out["region_EU"] = out["Area"].isin(EU)
+    out["region_EUEEAUK"] = out["Area"].isin(EEA_PLUS_UK)
+    out["region_europe"] = out["Area"].isin(EUROPE_WIDE)
+
+    out = out[["Area", "Item", "Year", "Metric", "Value", "item_kind",
+               "is_all", "is_aggregated", "is_atomic",
+               "region_EU", "region_EUEEAUK", "region_europe"]]
+    out = out.sort_values(["Area", "Item", "Year", "Metric"], kind="stable")
+
+    out.to_csv(outp, index=False)
+    # Sortie Parquet jumelle (si PyArrow dispo) : les consommateurs avals peuvent éviter
+    # de re-parser le CSV (chargement colonnes + dictionnaires, nettement plus rapide).
+    if HAS_PYARROW:
+        out.to_parquet(outp.with_suffix(".parquet"), index=False)
+    print(f"OK — {len(out)} lignes écrites dans {outp}")
+
+
+if __name__ == "__main__":
+    main()
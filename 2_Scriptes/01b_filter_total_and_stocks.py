@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filtrage du CSV préparé — ne garder que `Total_CO2e` et `Stocks`
+================================================================
+
+
+But du script
+-------------
+Réduire le CSV long préparé (sortie de `01_preprocess_livestock_data_generic.py`) au
+périmètre des modèles Streamlit : uniquement les métriques `Total_CO2e` et `Stocks`.
+Pratique pour alléger le fichier embarqué dans un dépôt ou un déploiement.
+
+
+Mise en œuvre
+-------------
+Le travail est un simple scan-filtre-projection : avec **Polars** (optionnel), le pipeline
+lazy (`scan_csv` → `filter` → `sink_csv`) streame le fichier sans le matérialiser en
+mémoire, avec pushdown des prédicats. Sans Polars, repli sur un filtre pandas vectorisé.
+Si un fichier Parquet jumeau (`<stem>.parquet`, produit par le script 01) existe à côté
+du CSV, il est préféré pour éviter de re-parser le CSV.
+
+
+Paramètres CLI
+--------------
+--input : CSV préparé (format long, colonne `Metric` obligatoire)
+--output : Chemin de sortie (par défaut `<input>_filtered.csv`)
+--drop-zero : true/false — supprimer aussi les lignes dont `Value` vaut 0 (ou n'est pas numérique)
+"""
+
+
+from __future__ import annotations
+import argparse, sys
+from pathlib import Path
+
+
+# --- Dépendance optionnelle : Polars (pipeline lazy en streaming) --------------------------------
+try:
+    import polars as pl
+    HAS_POLARS = True
+except Exception:
+    HAS_POLARS = False
+
+
+# Métriques conservées (comparées après normalisation minuscules + espaces → underscores)
+KEEP_METRICS = ["total_co2e", "stocks"]
+
+
+def str2bool(v: str) -> bool:
+    return str(v).strip().lower() in {"1", "true", "yes", "oui", "y"}
+
+
+def filter_polars(inp: Path, outp: Path, drop_zero: bool) -> None:
+    """Pipeline lazy Polars : scan → filtre → écriture en streaming (pas de matérialisation)."""
+    parquet = inp.with_suffix(".parquet")
+    if parquet.exists():
+        lf = pl.scan_parquet(parquet)
+    else:
+        lf = pl.scan_csv(inp)
+    out = (
+        lf.with_columns(pl.col("Metric").cast(pl.String).str.to_lowercase()
+                          .str.replace_all(" ", "_").alias("_m"))
+          .filter(pl.col("_m").is_in(KEEP_METRICS))
+          .drop("_m")
+    )
+    if drop_zero:
+        out = out.filter(pl.col("Value").cast(pl.Float64, strict=False).fill_null(0.0) != 0.0)
+    out.sink_csv(outp)
+
+
+def filter_pandas(inp: Path, outp: Path, drop_zero: bool) -> None:
+    """Repli pandas : même filtre, vectorisé (pas d'apply ligne à ligne)."""
+    import pandas as pd
+    parquet = inp.with_suffix(".parquet")
+    df = pd.read_parquet(parquet) if parquet.exists() else pd.read_csv(inp)
+    norm = df["Metric"].astype(str).str.lower().str.replace(" ", "_", regex=False)
+    df = df[norm.isin(KEEP_METRICS)]
+    if drop_zero:
+        df = df[pd.to_numeric(df["Value"], errors="coerce").fillna(0.0) != 0.0]
+    df.to_csv(outp, index=False)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Filtre le CSV préparé sur Total_CO2e et Stocks.")
+    ap.add_argument("--input", required=True, help="CSV préparé (format long)")
+    ap.add_argument("--output", default=None, help="CSV de sortie (défaut : <input>_filtered.csv)")
+    ap.add_argument("--drop-zero", default="false", help="true/false — supprimer les valeurs nulles")
+    args = ap.parse_args()
+
+    inp = Path(args.input)
+    if not inp.exists():
+        sys.exit(f"Fichier introuvable : {inp}")
+    outp = Path(args.output) if args.output else inp.with_name(inp.stem + "_filtered.csv")
+    drop_zero = str2bool(args.drop_zero)
+
+    if HAS_POLARS:
+        filter_polars(inp, outp, drop_zero)
+    else:
+        filter_pandas(inp, outp, drop_zero)
+    print(f"OK — sortie filtrée écrite dans {outp}")
+
+
+if __name__ == "__main__":
+    main()
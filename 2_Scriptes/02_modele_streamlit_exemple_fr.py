@@ -44,7 +44,7 @@ from pathlib import Path
 # Nous préférons Plotly pour la choroplèthe. S'il n'est pas installé, on met un indicateur et on
 # affiche ensuite un message d'erreur clair dans l'onglet Carte. Le reste de l'appli reste fonctionnel.
 try:
-    import plotly.express as px
+    import plotly.graph_objects as go
     HAS_PLOTLY = True
     # Palette corporate (issue du thème GAEA) utilisée uniquement pour la choroplèthe Plotly
     CORP_SCALE = [
@@ -61,6 +61,15 @@ try:
 except Exception:
     HAS_PLOTLY = False
 
+# --- Dépendance optionnelle pour les agrégations ------------------------------------------------
+# Si Polars est installé, les filtres + groupbys des onglets passent par son moteur lazy
+# (multi-thread, 2-3× plus rapide que pandas sur ce type de réduction) ; sinon, repli pandas.
+try:
+    import polars as pl
+    HAS_POLARS = True
+except Exception:
+    HAS_POLARS = False
+
 # ---------------------------
 # 0) Page / thème / palette
 # ---------------------------
@@ -89,7 +98,11 @@ CORP = {
 }
 
 # Injection CSS légère pour harmoniser les widgets Streamlit avec la charte maison.
-st.markdown(f"""
+# La feuille de style est construite une seule fois par processus (st.cache_resource)
+# plutôt qu'à chaque rerun ; st.markdown la ré-émet à chaque rendu.
+@st.cache_resource
+def _corp_css() -> str:
+    return f"""
 <style>
 .stApp {{ background-color: {CORP["bg"]}; color: {CORP["text"]}; }}
 section[data-testid="stSidebar"] > div:first-child {{ background-color: {CORP["panel"]} !important; }}
@@ -100,7 +113,9 @@ section[data-testid="stSidebar"] > div:first-child {{ background-color: {CORP["p
 .block-container {{ background: transparent; }}
 label, .stSelectbox label, .stRadio label {{ color: {CORP["text"]} !important; }}
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(_corp_css(), unsafe_allow_html=True)
 
 # Thème Altair (cohérence des courbes et du camembert). On l'enregistre puis on l'active.
 ALT_CATEGORY = ["#9E0142","#D53E4F","#F46D43","#FDAE61","#FEE08B","#E6F598","#ABDDA4","#66C2A5","#3288BD","#5E4FA2"]*4
@@ -117,25 +132,42 @@ def _corp_altair_theme():
         }
     }
 
-alt.themes.register("corp", _corp_altair_theme)
-alt.themes.enable("corp")
+# Enregistrement/activation une seule fois par processus : Streamlit ré-exécute tout le
+# script à chaque interaction, inutile de ré-enregistrer le thème à chaque rerun.
+@st.cache_resource
+def _install_theme() -> bool:
+    alt.themes.register("corp", _corp_altair_theme)
+    alt.themes.enable("corp")
+    return True
+
+_install_theme()
+
+# Normalisation d'item_kind vers les trois valeurs canoniques utilisées par l'UI
+# (toute valeur inconnue est traitée comme « atomic »).
+_KIND_NORM_MAP = {"all": "All", "all animals": "All", "all_animals": "All",
+                  "aggregated": "aggregated", "aggregate": "aggregated"}
+
 
 # Convertit les codes de métrique en libellés lisibles pour l'axe Y.
-# Ajoutez d'autres métriques ici si nécessaire.
+# Ajoutez d'autres métriques dans le dict ci-dessous si nécessaire.
+_METRIC_LABEL = {"Total_CO2e": "Total (kt CO₂e)", "Stocks": "Effectif (têtes)"}
+
 def metric_unit_label(metric: str) -> str:
-    if metric == "Total_CO2e": return "Total (kt CO₂e)"
-    if metric == "Stocks":     return "Effectif (têtes)"
-    return metric
+    return _METRIC_LABEL.get(metric, metric)
 
 # ---------------------------
 # 1) Chargement des données
 # ---------------------------
 # On met en cache le chargement pour accélérer les interactions. La fonction valide aussi le schéma
 # et limite l'appli aux deux métriques prévues par ce modèle.
-@st.cache_data
+# st.cache_resource (et non cache_data) : le DataFrame est partagé entre sessions par
+# référence, sans la copie profonde que cache_data refait à chaque session. En contrepartie
+# il doit être traité en LECTURE SEULE — les onglets ne font que des slices/groupbys et les
+# fonctions de calcul retournent des frames neufs, jamais de écriture en place sur `df`.
+@st.cache_resource
 def load_prepared(path: Path) -> pd.DataFrame:
     """
-    Charge le CSV préparé (format long).
+    Charge le CSV préparé (format long). Le résultat est partagé : ne pas muter en place.
 
     Colonnes attendues
     ------------------
@@ -143,7 +175,29 @@ def load_prepared(path: Path) -> pd.DataFrame:
     - item_kind (catégories : 'All' | 'aggregated' | 'atomic')
     - drapeaux de région : region_europe, region_EU, region_EUEEAUK
     """
-    df = pd.read_csv(path)
+    # Préfère le jumeau Parquet (écrit par le script 01, ou ci-dessous lors d'un chargement
+    # précédent) : lecture colonnes + dictionnaires bien plus rapide que re-parser le CSV.
+    pq = path.with_suffix(".parquet")
+    metrics_filtered = False
+    if pq.exists() and pq.stat().st_mtime >= path.stat().st_mtime:
+        if HAS_POLARS:
+            # Scan lazy : le filtre Metric est poussé dans la lecture Parquet (pushdown),
+            # seules les lignes des deux métriques du modèle sont matérialisées.
+            df = (pl.scan_parquet(pq)
+                    .filter(pl.col("Metric").is_in(["Total_CO2e","Stocks"]))
+                    .collect().to_pandas())
+            metrics_filtered = True
+        else:
+            df = pd.read_parquet(pq, dtype_backend="pyarrow")
+    else:
+        df = pd.read_csv(path)
+        try:
+            # Écriture atomique du jumeau Parquet pour accélérer le prochain démarrage à froid.
+            tmp = pq.with_name(pq.name + ".tmp")
+            df.to_parquet(tmp, index=False)
+            tmp.replace(pq)
+        except Exception:
+            pass  # Parquet indisponible (ex. PyArrow absent) : on reste sur le CSV.
 
     # Validation des colonnes minimales ; message explicite si manquantes.
     need = {"Area","Item","Year","Metric","Value","item_kind",
@@ -152,10 +206,24 @@ def load_prepared(path: Path) -> pd.DataFrame:
     if miss:
         st.error(f"Colonnes manquantes dans le CSV préparé : {', '.join(sorted(miss))}"); st.stop()
 
-    # On ne conserve que les métriques qui nous intéresse.
-    df = df[df["Metric"].isin(["Total_CO2e","Stocks"])].copy()
+    # On ne conserve que les métriques qui nous intéresse (déjà fait si pushdown Polars).
+    if not metrics_filtered:
+        df = df[df["Metric"].isin(["Total_CO2e","Stocks"])].copy()
     # item_kind en texte pour éviter des soucis lors des normalisations.
     df["item_kind"] = df["item_kind"].astype(str)
+    # Dtypes compacts : libellés répétés en `category` (les groupbys, isin et égalités
+    # comparent alors des petits entiers, pour ~8× moins de RAM que des objets Python),
+    # années en int16 — moins de bande passante mémoire sur tous les filtres par période.
+    for c in ("Area","Item","Metric","item_kind"):
+        df[c] = df[c].astype("category")
+    df["Year"] = df["Year"].astype("int16")
+    # Colonne normalisée calculée une seule fois au chargement (vectorisé) : les onglets
+    # filtrent ensuite par simple égalité, sans apply Python ligne à ligne à chaque rerun.
+    df["item_kind_norm"] = (df["item_kind"].str.strip().str.lower()
+                                           .map(_KIND_NORM_MAP).fillna("atomic").astype("category"))
+    # Drapeau « (group total) » précalculé : évite de rescanner Area à chaque interaction
+    # (regex=False — les parenthèses sont littérales ici, l'ancien appel les interprétait).
+    df["is_group_total"] = df["Area"].str.contains("(group total)", case=False, na=False, regex=False)
     return df
 
 # Lecture depuis le chemin par défaut ou via un upload interactif.
@@ -166,6 +234,9 @@ if not path.exists():
     if uploaded is None: st.stop()
     df = pd.read_csv(uploaded)
     df = df[df["Metric"].isin(["Total_CO2e","Stocks"])].copy()
+    df["item_kind_norm"] = (df["item_kind"].astype(str).str.strip().str.lower()
+                                           .map(_KIND_NORM_MAP).fillna("atomic").astype("category"))
+    df["is_group_total"] = df["Area"].str.contains("(group total)", case=False, na=False, regex=False)
 else:
     df = load_prepared(path)
 
@@ -174,12 +245,153 @@ year_min, year_max = int(df["Year"].min()), int(df["Year"].max())
 DEFAULT_START = max(1992, year_min)
 DEFAULT_END   = min(2022, year_max)
 
-# Normalise item_kind vers les trois valeurs canoniques utilisées par l'UI.
-def normalize_kind_value(v: str) -> str:
-    s = str(v).strip().lower()
-    if s in {"all","all animals","all_animals"}: return "All"
-    if s in {"aggregated","aggregate"}: return "aggregated"
-    return "atomic"
+# ---------------------------
+# 1bis) Calculs par onglet (mis en cache)
+# ---------------------------
+# Les filtres + groupbys de chaque onglet sont factorisés dans des fonctions @st.cache_data
+# clées sur la signature des filtres : un simple tick de curseur ou de case à cocher ne
+# redéclenche plus les agrégations pandas si les entrées n'ont pas changé. `df` est déjà
+# caché et n'est jamais muté : on le hache par identité (id) plutôt que par contenu.
+
+if HAS_POLARS:
+    @st.cache_resource
+    def polars_frame(df_key: int, _df: pd.DataFrame) -> "pl.DataFrame":
+        """Copie Polars unique du DataFrame chargé (convertie une fois, lecture seule)."""
+        return pl.from_pandas(_df)
+
+@st.cache_resource
+def ts_view(df_key: int, _df: pd.DataFrame) -> pd.DataFrame:
+    """Vue triée et indexée (Metric, item_kind_norm, Year) du DataFrame chargé.
+
+    Construite une seule fois : les tranches `.loc[(metric, kind, y0:y1)]` se font ensuite
+    par recherche dichotomique (O(log n + k)) au lieu de trois scans booléens pleine colonne
+    à chaque rerun."""
+    return (_df.sort_values(["Metric","item_kind_norm","Year"], kind="stable")
+               .set_index(["Metric","item_kind_norm","Year"]))
+
+@st.cache_data(hash_funcs={pd.DataFrame: id})
+def compute_ts_base(df: pd.DataFrame, metric: str, y0: int, y1: int,
+                    kind_value: str, items: tuple) -> pd.DataFrame:
+    """Sous-ensemble (métrique, période, groupe d'items, items choisis) de l'onglet Tendances."""
+    view = ts_view(id(df), df)
+    try:
+        base = view.loc[(metric, kind_value, slice(y0, y1)), :].reset_index()
+    except KeyError:
+        # Métrique ou groupe absent du jeu de données : sous-ensemble vide.
+        return view.iloc[0:0].reset_index()
+    return base[base["Item"].isin(items)]
+
+@st.cache_data(hash_funcs={pd.DataFrame: id})
+def compute_ts_totals(df: pd.DataFrame, metric: str, y0: int, y1: int, kind_value: str,
+                      items: tuple, show_region: bool, region_choice, mode, keep: tuple) -> pd.DataFrame:
+    """Séries à tracer (Area, Year, SeriesValue) — total régional ou pays retenus."""
+    if HAS_POLARS:
+        lf = polars_frame(id(df), df).lazy().filter(
+            (pl.col("Metric") == metric)
+            & pl.col("Year").is_between(y0, y1)
+            & (pl.col("item_kind_norm") == kind_value)
+            & pl.col("Item").is_in(list(items))
+        )
+        if show_region:
+            out = (lf.filter(pl.col(FLAG_MAP[region_choice]) & ~pl.col("is_group_total"))
+                     .group_by("Year").agg(pl.col("Value").sum().alias("SeriesValue"))
+                     .sort("Year").collect().to_pandas())
+            if not out.empty:
+                out.insert(0, "Area", region_choice)
+            return out
+        if keep:
+            lf = lf.filter(pl.col("Area").is_in(list(keep)))
+        return (lf.group_by(["Area","Year"]).agg(pl.col("Value").sum().alias("SeriesValue"))
+                  .sort(["Area","Year"]).collect().to_pandas())
+    base = compute_ts_base(df, metric, y0, y1, kind_value, items)
+    if show_region:
+        flag_col = FLAG_MAP[region_choice]
+        sub = base[base[flag_col] & ~base["is_group_total"]]
+        if sub.empty:
+            return sub
+        return (
+            sub.groupby(["Year"], as_index=False, observed=True)["Value"].sum()
+               .assign(Area=region_choice)[["Area","Year","Value"]]
+               .rename(columns={"Value":"SeriesValue"})
+        )
+    sub = base
+    if keep:
+        sub = sub[sub["Area"].isin(keep)]
+    return sub.groupby(["Area","Year"], as_index=False, observed=True)["Value"].sum().rename(columns={"Value":"SeriesValue"})
+
+# Les octets CSV sont mis en cache sur le hachage du contenu du DataFrame : tant que la
+# sélection produit les mêmes données, les clics répétés (et les reruns) réutilisent
+# les mêmes octets sans re-sérialiser.
+@st.cache_data(hash_funcs={pd.DataFrame: lambda df: pd.util.hash_pandas_object(df, index=True).values.tobytes()})
+def _csv_bytes(df: pd.DataFrame) -> bytes:
+    """Sérialise un export en CSV UTF-8 — via le writer Rust multi-thread de Polars
+    si disponible, sinon via pandas (writer Python mono-thread)."""
+    if HAS_POLARS:
+        return pl.from_pandas(df).write_csv().encode("utf-8")
+    return df.to_csv(index=False).encode("utf-8")
+
+@st.cache_data(hash_funcs={pd.DataFrame: id})
+def items_for_kind(df: pd.DataFrame, kind_value: str) -> list:
+    """Items disponibles (triés) pour un groupe d'items donné."""
+    return sorted(df.loc[df["item_kind_norm"] == kind_value, "Item"].dropna().unique().tolist())
+
+@st.cache_data(hash_funcs={pd.DataFrame: id})
+def countries_for(df: pd.DataFrame, metric: str, y0: int, y1: int,
+                  kind_value: str, items: tuple) -> list:
+    """Pays sélectionnables (hors lignes « (group total) ») pour le mode personnalisé."""
+    base = compute_ts_base(df, metric, y0, y1, kind_value, items)
+    return sorted(base.loc[~base["is_group_total"], "Area"].dropna().unique().tolist())
+
+@st.cache_data(hash_funcs={pd.DataFrame: id})
+def compute_pie_agg(df: pd.DataFrame, year_pie: int) -> pd.DataFrame:
+    """Lignes agrégées (Total_CO2e) de l'année du camembert."""
+    # Recherche dichotomique dans la vue triée (Metric, kind, Year) — pas de masque
+    # booléen pleine colonne pour un lookup mono-année.
+    view = ts_view(id(df), df)
+    try:
+        return view.loc[("Total_CO2e", "aggregated", slice(year_pie, year_pie)), :].reset_index()
+    except KeyError:
+        return view.iloc[0:0].reset_index()
+
+@st.cache_data(hash_funcs={pd.DataFrame: id})
+def compute_pie_df(df: pd.DataFrame, year_pie: int, area_choice: str) -> pd.DataFrame:
+    """Valeurs par groupe agrégé pour la zone choisie (région calculée ou pays)."""
+    if HAS_POLARS:
+        lf = polars_frame(id(df), df).lazy().filter(
+            (pl.col("item_kind_norm") == "aggregated")
+            & (pl.col("Metric") == "Total_CO2e") & (pl.col("Year") == year_pie)
+        )
+        if area_choice in REGION_OPTIONS:
+            lf = lf.filter(pl.col(FLAG_MAP[area_choice]) & ~pl.col("is_group_total"))
+        else:
+            lf = lf.filter(pl.col("Area") == area_choice)
+        return (lf.group_by("Item").agg(pl.col("Value").sum())
+                  .sort("Item").collect().to_pandas())
+    agg = compute_pie_agg(df, year_pie)
+    if area_choice in REGION_OPTIONS:
+        flag_col = FLAG_MAP[area_choice]
+        sel = agg[agg[flag_col] & ~agg["is_group_total"]]
+    else:
+        sel = agg[agg["Area"]==area_choice]
+    return sel[["Item","Value"]].groupby("Item", as_index=False, observed=True)["Value"].sum()
+
+@st.cache_data(hash_funcs={pd.DataFrame: id})
+def compute_map_df(df: pd.DataFrame, year_map: int) -> pd.DataFrame:
+    """Total_CO2e par pays d'Europe (groupe 'All') pour l'année de la carte."""
+    if HAS_POLARS:
+        return (polars_frame(id(df), df).lazy()
+                  .filter((pl.col("item_kind_norm") == "All")
+                          & (pl.col("Metric") == "Total_CO2e") & (pl.col("Year") == year_map)
+                          & ~pl.col("is_group_total") & pl.col("region_europe"))
+                  .group_by("Area").agg(pl.col("Value").sum())
+                  .sort("Area").collect().to_pandas())
+    view = ts_view(id(df), df)
+    try:
+        sub = view.loc[("Total_CO2e", "All", slice(year_map, year_map)), :].reset_index()
+    except KeyError:
+        sub = view.iloc[0:0].reset_index()
+    sub = sub[~sub["is_group_total"] & sub["region_europe"]]
+    return sub.groupby(["Area"], as_index=False, observed=True)["Value"].sum()
 
 # ---------------------------
 # 2) Onglets
@@ -214,7 +426,7 @@ with tab_ts:
         )
 
     # --- Regroupement d'items (All / aggregated / atomic) ------------------------
-    kinds_present = sorted({normalize_kind_value(v) for v in df["item_kind"].unique()})
+    kinds_present = sorted(df["item_kind_norm"].unique().tolist())
     kind_label_to_value = {"Tous": "All", "Agrégés": "aggregated", "Atomiques": "atomic"}
     default_kind_label = (
         "Tous" if "All" in kinds_present else ("Agrégés" if "aggregated" in kinds_present else "Atomiques")
@@ -229,9 +441,9 @@ with tab_ts:
         )
     kind_value = kind_label_to_value[kind_label]
 
-    # Liste des items disponibles pour le groupe choisi. Pour "Tous", on force une sélection unique.
-    subset = df[df["item_kind"].apply(lambda x: normalize_kind_value(x) == kind_value)]
-    items_all = sorted(subset["Item"].dropna().unique().tolist())
+    # Liste des items disponibles pour le groupe choisi (mise en cache — pas de passe
+    # unique()+tri à chaque tick de widget). Pour "Tous", on force une sélection unique.
+    items_all = items_for_kind(df, kind_value)
 
     ITEMS_KEY = "items_template_multiselect"
     if ITEMS_KEY not in st.session_state:
@@ -275,22 +487,15 @@ with tab_ts:
         region_choice = st.selectbox("Région", REGION_OPTIONS, index=0, disabled=not show_region)
 
     # Prépare le dataframe pour le tracé : filtre métrique, période, item_kind et items choisis.
-    base = df[(df["Metric"]==metric) & (df["Year"]>=year_range[0]) & (df["Year"]<=year_range[1])]
-    base = base[base["item_kind"].apply(lambda x: normalize_kind_value(x) == kind_value)]
-    base = base[base["Item"].isin(items)]
+    base = compute_ts_base(df, metric, year_range[0], year_range[1], kind_value, tuple(items))
     if base.empty: st.info("Aucune donnée pour ces filtres."); st.stop()
 
     if show_region:
-        # Calcule les totaux régionaux à partir des booléens de région. On élimine les lignes "(group total)".
-        flag_col = FLAG_MAP[region_choice]
-        sub = base[base[flag_col] & ~base["Area"].str.contains("(group total)", case=False, na=False)].copy()
-        if sub.empty:
+        # Totaux régionaux calculés à partir des booléens de région (hors lignes "(group total)").
+        totals = compute_ts_totals(df, metric, year_range[0], year_range[1], kind_value,
+                                   tuple(items), True, region_choice, None, ())
+        if totals.empty:
             st.info(f"Aucun pays étiqueté pour la région : {region_choice}."); st.stop()
-        totals = (
-            sub.groupby(["Year"], as_index=False)["Value"].sum()
-               .assign(Area=region_choice)[["Area","Year","Value"]]
-               .rename(columns={"Value":"SeriesValue"})
-        )
     else:
         # Mode pays :
         #  - Présélection (Top 10) issue d'un groupe régional (option ‘Ajouter la Suisse’)
@@ -300,34 +505,33 @@ with tab_ts:
             mode = st.radio("Mode de sélection des pays", ["Présélection (Top 10)", "Personnalisé (au choix)"])
             add_ch = False
             preset_choice = None
-            available_countries = sorted(
-                base[~base["Area"].str.contains("(group total)", case=False, na=False)]["Area"].dropna().unique().tolist()
-            )
+            available_countries = countries_for(df, metric, year_range[0], year_range[1],
+                                                kind_value, tuple(items))
             if mode == "Présélection (Top 10)":
                 preset_choice = st.selectbox("Groupe présélectionné", ["Europe","UE","UE/EEE+R.-Uni"], index=0)
                 add_ch = st.checkbox("Ajouter la Suisse 🇨🇭", value=False)
             else:
                 selected_countries = st.multiselect("Pays (max 12)", options=available_countries, max_selections=12)
 
-        sub = base.copy()
         if mode == "Présélection (Top 10)":
             flag_col = FLAG_MAP[preset_choice]
-            pool = sorted(sub.loc[sub[flag_col] & ~sub["Area"].str.contains("(group total)", case=False, na=False), "Area"].unique().tolist())
-            latest_year = sub["Year"].max()
-            latest = sub[(sub["Year"]==latest_year) & (sub["Area"].isin(pool))]
-            ranked = (
-                latest.groupby("Area", as_index=False)["Value"].sum()
-                      .sort_values("Value", ascending=False)["Area"].tolist()
+            pool_set = set(base.loc[base[flag_col] & ~base["is_group_total"], "Area"].unique())
+            latest_year = base["Year"].max()
+            latest = base[(base["Year"]==latest_year) & (base["Area"].isin(pool_set))]
+            # Sélection partielle en tas (nlargest, O(n log 10)) plutôt qu'un tri complet,
+            # et appartenances testées sur des sets plutôt que des listes.
+            keep = (
+                latest.groupby("Area", as_index=False, observed=True)["Value"].sum()
+                      .nlargest(10, "Value")["Area"].tolist()
             )
-            keep = ranked[:10]
-            if add_ch and "Switzerland" in pool and "Switzerland" not in keep:
+            if add_ch and "Switzerland" in pool_set and "Switzerland" not in set(keep):
                 keep.append("Switzerland")
         else:
             keep = selected_countries if 'selected_countries' in locals() and selected_countries else []
 
-        if keep: sub = sub[sub["Area"].isin(keep)]
-        if sub.empty: st.info("Aucune donnée après sélection des pays."); st.stop()
-        totals = sub.groupby(["Area","Year"], as_index=False)["Value"].sum().rename(columns={"Value":"SeriesValue"})
+        totals = compute_ts_totals(df, metric, year_range[0], year_range[1], kind_value,
+                                   tuple(items), False, None, mode, tuple(keep))
+        if totals.empty: st.info("Aucune donnée après sélection des pays."); st.stop()
 
     # --- Graphique ----------------------------------------------------------------
     y_label = metric_unit_label(metric)
@@ -339,28 +543,36 @@ with tab_ts:
     order_latest = (
         totals[totals["Year"]==totals["Year"].max()].sort_values("SeriesValue", ascending=False)["Area"].tolist()
     )
-    chart = (
-        alt.Chart(totals)
-           .mark_line(point=True)
-           .encode(
-               x=alt.X("Year:O", title="Année"),
-               y=alt.Y("SeriesValue:Q", title=y_label),
-               color=alt.Color("Area:N", sort=order_latest, legend=alt.Legend(title="Région" if show_region else "Pays")),
-               tooltip=[
-                   alt.Tooltip("Area:N", title="Région" if show_region else "Pays"),
-                   alt.Tooltip("Year:O", title="Année"),
-                   alt.Tooltip("SeriesValue:Q", title=y_label, format=",.0f"),
-               ],
-           )
-           .properties(height=520)
-    )
-    st.altair_chart(chart, use_container_width=True)
+    # Spécification Vega-Lite construite à la main : on court-circuite la construction
+    # d'objets Altair et la validation schemapi (une grosse part du coût de chaque rerun) ;
+    # st.vega_lite_chart transmet le dict tel quel au frontend. Le thème maison est injecté
+    # via sa config (les specs directes ne passent pas par le thème Altair enregistré).
+    legend_title = "Région" if show_region else "Pays"
+    line_spec = {
+        "mark": {"type": "line", "point": True},
+        "encoding": {
+            "x": {"field": "Year", "type": "ordinal", "title": "Année"},
+            "y": {"field": "SeriesValue", "type": "quantitative", "title": y_label},
+            "color": {"field": "Area", "type": "nominal", "sort": order_latest,
+                      "legend": {"title": legend_title}},
+            "tooltip": [
+                {"field": "Area", "type": "nominal", "title": legend_title},
+                {"field": "Year", "type": "ordinal", "title": "Année"},
+                {"field": "SeriesValue", "type": "quantitative", "title": y_label, "format": ",.0f"},
+            ],
+        },
+        "height": 520,
+        "config": _corp_altair_theme()["config"],
+    }
+    st.vega_lite_chart(totals, line_spec, use_container_width=True)
 
-    # Export CSV de la série agrégée.
-    csv_bytes = totals.to_csv(index=False).encode("utf-8")
+    # Export CSV de la série agrégée — encodage différé : le callable n'est invoqué qu'au
+    # clic sur le bouton, donc plus de sérialisation CSV systématique à chaque rerun.
     fname = f"series_temporelles_{metric}_{kind_value}_{year_range[0]}_{year_range[1]}"
     fname += f"_{region_choice}_REGION.csv" if show_region else ".csv"
-    st.download_button("Télécharger la série en CSV", data=csv_bytes, file_name=fname, mime="text/csv")
+    st.download_button("Télécharger la série en CSV",
+                       data=lambda df=totals: _csv_bytes(df),
+                       file_name=fname, mime="text/csv")
 
 # =========================
 # Onglet : Composition (camembert)
@@ -377,8 +589,7 @@ with tab_pie:
     year_pie = st.slider("Année du camembert", min_value=year_min, max_value=year_max, value=min(2022, year_max), step=1)
 
     # On limite à item_kind == aggregated pour garder un nombre de parts lisible.
-    agg = df[(df["item_kind"].apply(lambda x: str(x).strip().lower() in {"aggregated","aggregate"})) &
-             (df["Metric"]==metric_pie) & (df["Year"]==year_pie)].copy()
+    agg = compute_pie_agg(df, year_pie)
     if agg.empty:
         st.info("Aucune ligne agrégée pour cette année."); st.stop()
 
@@ -387,53 +598,55 @@ with tab_pie:
     countries = [a for a in areas if "group total" not in str(a).lower()]
     area_choice = st.selectbox("Choisir une zone (région ou pays)", ["Europe","UE","UE/EEE+R.-Uni"] + countries, index=0)
 
-    # Calcul des parts selon le type de zone choisi.
-    if area_choice in ["Europe","UE","UE/EEE+R.-Uni"]:
-        flag_col = FLAG_MAP[area_choice]
-        pie_df = (
-            agg[agg[flag_col] & ~agg["Area"].str.contains("(group total)", case=False, na=False)][["Item","Value"]]
-               .groupby("Item", as_index=False)["Value"].sum()
-        )
-        title_area = area_choice
-    else:
-        pie_df = agg[agg["Area"]==area_choice][["Item","Value"]].groupby("Item", as_index=False)["Value"].sum()
-        title_area = area_choice
+    # Calcul des parts selon le type de zone choisi (mis en cache sur (année, zone)).
+    pie_df = compute_pie_df(df, year_pie, area_choice)
+    title_area = area_choice
 
     # Vérification : somme > 0 pour tracer.
     total_val = float(pie_df["Value"].sum()) if not pie_df.empty else 0.0
     if total_val <= 0 or pie_df.empty:
         st.info("Aucune valeur positive à tracer pour cette sélection."); st.stop()
 
-    # Calcul des parts — arrondis uniquement pour l'affichage.
+    # Calcul des parts — une seule division vectorisée ; les arrondis sont faits par les
+    # formats d'affichage (infobulles Vega, column_config), pas par des colonnes matérialisées.
     pie_df["Share"] = pie_df["Value"] / total_val
-    pie_df["Part (%)"] = (pie_df["Share"] * 100).round(1)
-    pie_df_display = pie_df[["Item","Value","Part (%)"]].sort_values("Value", ascending=False)
-    pie_df_display = pie_df_display.rename(columns={"Value": "Valeur (kt CO₂e)"})
-    pie_df_display["Valeur (kt CO₂e)"] = pie_df_display["Valeur (kt CO₂e)"].round(0)
-
-    # Camembert Altair.
-    pie = (
-        alt.Chart(pie_df)
-           .mark_arc(outerRadius=160)
-           .encode(
-               theta=alt.Theta(field="Value", type="quantitative", stack=True),
-               color=alt.Color(field="Item", type="nominal", scale=alt.Scale(range=ALT_CATEGORY[:12]), legend=alt.Legend(title="Groupe agrégé")),
-               tooltip=[
-                   alt.Tooltip("Item:N", title="Groupe"),
-                   alt.Tooltip("Value:Q", title="Valeur (kt CO₂e)", format=",.0f"),
-                   alt.Tooltip("Share:Q", title="Part", format=".1%"),
-               ],
-           )
-           .properties(width=520, height=520, title=f"{metric_unit_label(metric_pie)} — {title_area} — {year_pie}")
-    )
-    st.altair_chart(pie, use_container_width=False)
+    pie_df_display = (pie_df.sort_values("Value", ascending=False)
+                            .rename(columns={"Value": "Valeur (kt CO₂e)", "Share": "Part"}))
+
+    # Camembert en spec Vega-Lite directe (même raison que la courbe : pas de re-validation
+    # Altair à chaque rerun).
+    pie_spec = {
+        "mark": {"type": "arc", "outerRadius": 160},
+        "encoding": {
+            "theta": {"field": "Value", "type": "quantitative", "stack": True},
+            "color": {"field": "Item", "type": "nominal",
+                      "scale": {"range": ALT_CATEGORY[:12]},
+                      "legend": {"title": "Groupe agrégé"}},
+            "tooltip": [
+                {"field": "Item", "type": "nominal", "title": "Groupe"},
+                {"field": "Value", "type": "quantitative", "title": "Valeur (kt CO₂e)", "format": ",.0f"},
+                {"field": "Share", "type": "quantitative", "title": "Part", "format": ".1%"},
+            ],
+        },
+        "width": 520, "height": 520,
+        "title": f"{metric_unit_label(metric_pie)} — {title_area} — {year_pie}",
+        "config": _corp_altair_theme()["config"],
+    }
+    st.vega_lite_chart(pie_df, pie_spec, use_container_width=False)
 
     # Tableau et export.
     st.write("Données du camembert :")
-    st.dataframe(pie_df_display, use_container_width=True)
+    st.dataframe(
+        pie_df_display,
+        use_container_width=True,
+        column_config={
+            "Valeur (kt CO₂e)": st.column_config.NumberColumn(format="%d"),
+            "Part": st.column_config.NumberColumn(format="percent"),
+        },
+    )
     st.download_button(
         "Télécharger les données du camembert (CSV)",
-        data=pie_df_display.to_csv(index=False).encode("utf-8"),
+        data=lambda df=pie_df_display: _csv_bytes(df),
         file_name=f"camembert_{metric_pie}_{title_area.replace(' ','_')}_{year_pie}.csv",
         mime="text/csv",
     )
@@ -456,35 +669,45 @@ with tab_map:
 
     # La carte utilise item_kind == 'All' pour éviter les doubles comptes. On enlève ‘(group total)’
     # et on restreint aux pays étiquetés Europe via region_europe == True.
-    sub_all = df[df["item_kind"].apply(lambda v: str(v).strip().lower() in {"all","all animals","all_animals"})]
-    sub = sub_all[(sub_all["Metric"]==metric_map) & (sub_all["Year"]==year_map)].copy()
-    sub = sub[~sub["Area"].str.contains("(group total)", case=False, na=False)].copy()
-
-    sub = sub[sub["region_europe"]==True]
-
-    map_df = sub.groupby(["Area"], as_index=False)["Value"].sum()
+    # Tout le filtrage + groupby est mis en cache sur l'année (compute_map_df).
+    map_df = compute_map_df(df, year_map)
 
     # Normalisation de quelques noms de pays pour correspondre aux attentes Plotly.
+    # Sur une colonne catégorielle, renommer les catégories ne touche que le petit tableau
+    # des libellés (O(nb catégories)) au lieu de réécrire toute la colonne (O(nb lignes)).
+    # Garde-fou : on ne renomme que si la source existe et que la cible n'est pas déjà là.
     name_fix = {"UK": "United Kingdom", "Russia": "Russian Federation"}
-    map_df["Area"] = map_df["Area"].replace(name_fix)
-
-    label = "Total (kt CO₂e)"
-    fig = px.choropleth(
-        map_df,
-        locations="Area",
-        locationmode="country names",
-        color="Value",
-        scope="europe",
-        color_continuous_scale=CORP_SCALE,
-        labels={"Value": label, "Area": "Pays"},
-        title=f"{label} — Europe — {year_map}",
-    )
-    fig.update_layout(
-        margin=dict(l=10,r=10,t=50,b=10),
-        paper_bgcolor=CORP["bg"],
-        plot_bgcolor=CORP["panel"],
-        font_color=CORP["text"],
-    )
+    if isinstance(map_df["Area"].dtype, pd.CategoricalDtype):
+        cats = set(map_df["Area"].cat.categories)
+        fix = {old: new for old, new in name_fix.items() if old in cats and new not in cats}
+        if fix:
+            map_df["Area"] = map_df["Area"].cat.rename_categories(fix)
+    else:
+        map_df = map_df.assign(Area=map_df["Area"].replace(name_fix))
+
+    label = metric_unit_label(metric_map)
+    # Figure construite une seule fois par session : px.choropleth reconstruisait trace,
+    # géométrie et layout à chaque tick du curseur. Ici seuls les tableaux z/locations de
+    # la trace existante sont mis à jour d'une année à l'autre.
+    if "map_fig" not in st.session_state:
+        fig = go.Figure(go.Choropleth(
+            locationmode="country names",
+            colorscale=CORP_SCALE,
+            colorbar={"title": label},
+            hovertemplate="Pays : %{location}<br>" + label + " : %{z:,.0f}<extra></extra>",
+        ))
+        fig.update_geos(scope="europe")
+        fig.update_layout(
+            margin=dict(l=10,r=10,t=50,b=10),
+            paper_bgcolor=CORP["bg"],
+            plot_bgcolor=CORP["panel"],
+            font_color=CORP["text"],
+        )
+        st.session_state["map_fig"] = fig
+    fig = st.session_state["map_fig"]
+    fig.update_traces(z=map_df["Value"].to_numpy(),
+                      locations=map_df["Area"].astype(str).to_numpy())
+    fig.update_layout(title=f"{label} — Europe — {year_map}")
     st.plotly_chart(fig, use_container_width=True)
 
     # Valeurs cartographiées + export CSV.
@@ -494,7 +717,7 @@ with tab_map:
     st.dataframe(map_df_display.sort_values("Valeur (kt CO₂e)", ascending=False), use_container_width=True)
     st.download_button(
         "Télécharger les données de la carte (CSV)",
-        data=map_df_display.to_csv(index=False).encode("utf-8"),
+        data=lambda df=map_df_display: _csv_bytes(df),
         file_name=f"carte_Total_CO2e_{year_map}.csv",
         mime="text/csv",
     )
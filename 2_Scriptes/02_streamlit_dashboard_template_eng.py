@@ -34,29 +34,43 @@ py -m streamlit run .\2_Scriptes\streamlit_dashboard_template_totals_stocks_exam
 """
 
 from __future__ import annotations
-import streamlit as st, pandas as pd, altair as alt
+import streamlit as st, pandas as pd, numpy as np, altair as alt
 from pathlib import Path
 
 # --- Optional dependency for the map tab ---------------------------------------------------------
-# We prefer Plotly for the choropleth map. If it's not installed, we set a flag and later provide
-# a friendly error message in the Map tab. This lets the rest of the app work without Plotly.
+# We prefer Plotly for the choropleth map, but it is imported lazily inside the Map tab:
+# its import costs hundreds of ms on a cold start and users of the line/pie tabs never pay
+# it. If it's missing, the Map tab shows a friendly install hint; the rest of the app works.
+# Corporate color scale (kept from GAEA theme) used only for the Plotly choropleth.
+CORP_SCALE = [
+    [0.00, "#ABDDA4"],
+    [0.11, "#66C2A5"],
+    [0.22, "#3288BD"],
+    [0.33, "#5E4FA2"],
+    [0.44, "#FEE08B"],
+    [0.56, "#FDAE61"],
+    [0.67, "#F46D43"],
+    [0.78, "#D53E4F"],
+    [1.00, "#9E0142"]
+]
+
+# --- Optional dependency for CSV exports ----------------------------------------------------------
+# PyArrow writes utf-8 CSV bytes directly in multi-threaded C++; without it we fall back to
+# pandas' to_csv() + encode(), which is correct but materializes an intermediate Python string.
 try:
-    import plotly.express as px
-    HAS_PLOTLY = True
-    # Corporate color scale (kept from GAEA theme) used only for the Plotly choropleth
-    CORP_SCALE = [
-        [0.00, "#ABDDA4"],
-        [0.11, "#66C2A5"],
-        [0.22, "#3288BD"],
-        [0.33, "#5E4FA2"],
-        [0.44, "#FEE08B"],
-        [0.56, "#FDAE61"],
-        [0.67, "#F46D43"],
-        [0.78, "#D53E4F"],
-        [1.00, "#9E0142"]
-    ]
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+    HAS_PYARROW = True
 except Exception:
-    HAS_PLOTLY = False
+    HAS_PYARROW = False
+
+def df_to_csv_bytes(frame: pd.DataFrame) -> bytes:
+    """Encode a dataframe as utf-8 CSV bytes for st.download_button."""
+    if HAS_PYARROW:
+        buf = pa.BufferOutputStream()
+        pacsv.write_csv(pa.Table.from_pandas(frame, preserve_index=False), buf)
+        return buf.getvalue().to_pybytes()
+    return frame.to_csv(index=False).encode("utf-8")
 
 # ---------------------------
 # 0) Page / theme / palette
@@ -87,7 +101,11 @@ CORP = {
 
 # A tiny CSS injection to align Streamlit widgets with the house style (background, tabs, buttons).
 # Keep this minimal; prefer app-level theming or a design system if you need something complex.
-st.markdown(f"""
+# The stylesheet string is built once per process (st.cache_resource) instead of being
+# re-formatted on every widget rerun; st.markdown still emits it each render.
+@st.cache_resource
+def _corp_css() -> str:
+    return f"""
 <style>
 .stApp {{ background-color: {CORP["bg"]}; color: {CORP["text"]}; }}
 section[data-testid="stSidebar"] > div:first-child {{ background-color: {CORP["panel"]} !important; }}
@@ -98,7 +116,9 @@ section[data-testid="stSidebar"] > div:first-child {{ background-color: {CORP["p
 .block-container {{ background: transparent; }}
 label, .stSelectbox label, .stRadio label {{ color: {CORP["text"]} !important; }}
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(_corp_css(), unsafe_allow_html=True)
 
 # Altair theme for consistent charts (line and pie). We register a theme once and enable it.
 ALT_CATEGORY = ["#9E0142","#D53E4F","#F46D43","#FDAE61","#FEE08B","#E6F598","#ABDDA4","#66C2A5","#3288BD","#5E4FA2"]*4
@@ -115,8 +135,21 @@ def _corp_altair_theme():
         }
     }
 
-alt.themes.register("corp", _corp_altair_theme)
-alt.themes.enable("corp")
+# Register/enable once per process: Streamlit re-runs the whole script on every interaction,
+# and re-registering the theme each time is wasted work. st.cache_resource makes it a one-shot.
+@st.cache_resource
+def _install_theme() -> bool:
+    alt.themes.register("corp", _corp_altair_theme)
+    alt.themes.enable("corp")
+    return True
+
+_install_theme()
+
+# Normalization of free-text item_kind variants to the three canonical buckets used by
+# the UI (anything unrecognized is treated as "atomic").
+NORMALIZE_MAP = {"all": "All", "all animals": "All", "all_animals": "All",
+                 "aggregated": "aggregated", "aggregate": "aggregated"}
+
 
 # Helper to convert metric codes into human-friendly y-axis labels.
 # If you add more metrics in the future, extend this mapping.
@@ -128,12 +161,34 @@ def metric_unit_label(metric: str) -> str:
 # ---------------------------
 # 1) Load data
 # ---------------------------
+def _ui_metadata(df: pd.DataFrame) -> tuple[list, dict]:
+    """Precompute the widget option lists (kinds present, items per kind) from the frame."""
+    kinds_present = sorted(df["_kind_norm"].unique().tolist())
+    # Item is categorical, so the per-kind option list comes from the (already sorted)
+    # category index — O(#distinct items) instead of a hash pass over every row.
+    items_by_kind = {k: g["Item"].cat.remove_unused_categories().cat.categories.tolist()
+                     for k, g in df.groupby("_kind_norm", observed=True)}
+    return kinds_present, items_by_kind
+
+def _region_pools(df: pd.DataFrame) -> dict:
+    """Country pool per region preset, computed once from the boolean flag columns.
+
+    Area is categorical at this point, so each pool comes straight from the (sorted)
+    category index of the flagged slice rather than a row-level unique() pass.
+    """
+    return {r: (df.loc[df[FLAG_MAP[r]] & ~df["_is_group_total"], "Area"]
+                  .cat.remove_unused_categories().cat.categories.tolist())
+            for r in REGION_OPTIONS}
+
 # We cache loading so repeated UI interactions are fast. The function also validates the schema
-# and restricts the app to the two supported metrics for this template.
+# and restricts the app to the two supported metrics for this template. Widget metadata
+# (which kinds exist, which items belong to each kind) is computed here too, so the tabs
+# do dict lookups instead of re-running unique()+sort passes on every widget interaction.
+# The mtime argument is part of the cache key: a refreshed file invalidates the cache.
 @st.cache_data
-def load_prepared(path: Path) -> pd.DataFrame:
+def load_prepared(path: Path, mtime: float) -> tuple[pd.DataFrame, list, dict, dict]:
     """
-    Load the prepared long CSV.
+    Load the prepared long CSV and precompute UI metadata.
 
     Expected columns
     ----------------
@@ -152,9 +207,41 @@ def load_prepared(path: Path) -> pd.DataFrame:
 
     # Keep only the two metrics in scope for this template to keep the UI simple and predictable.
     df = df[df["Metric"].isin(["Total_CO2e","Stocks"])].copy()
+    # With exactly two metrics, a fixed categorical makes every `Metric == ...` filter a
+    # vectorized compare on int8 codes instead of per-row Python string comparisons.
+    df["Metric"] = df["Metric"].astype(pd.CategoricalDtype(["Total_CO2e","Stocks"]))
     # Ensure item_kind is string-typed to avoid issues when normalizing values later.
     df["item_kind"] = df["item_kind"].astype(str)
-    return df
+    # Normalized kind, computed once and vectorized: tab filters become a plain equality
+    # on category codes instead of calling a Python normalizer per row on every rerun.
+    df["_kind_norm"] = (df["item_kind"].str.strip().str.lower()
+                                       .map(NORMALIZE_MAP).fillna("atomic").astype("category"))
+    # Precomputed "(group total)" flag: one literal scan at load time (regex=False — the
+    # old per-rerun calls parsed the parens as a regex group) instead of five regex scans
+    # over Area on every interaction.
+    df["_is_group_total"] = df["Area"].str.contains("group total", case=False, na=False, regex=False)
+    # Area as a category: groupby/isin work on small integer codes instead of Python
+    # strings, which is the fast path for the per-rerun aggregations in the tabs.
+    df["Area"] = df["Area"].astype("category")
+    df["Item"] = df["Item"].astype("category")
+    # Compact numeric dtypes: the charts show 0 decimals, so float32 is plenty for Value,
+    # years fit in int16, and the region flags are plain 1-byte booleans. Every filter and
+    # groupby-sum then touches half (or less) of the memory.
+    df["Value"] = pd.to_numeric(df["Value"], downcast="float")
+    df["Year"] = df["Year"].astype("int16")
+    for flag in FLAG_MAP.values():
+        df[flag] = df[flag].astype(bool)
+    # Lowercased raw kind as a category: the pie/map tabs match against raw spelling
+    # variants, and a vectorized isin over category codes beats a per-row Python lambda.
+    df["_kind_lower"] = df["item_kind"].str.strip().str.lower().astype("category")
+    # The raw kind column itself is low-cardinality too; store it as a category now that
+    # the derived columns above have been computed from its string form.
+    df["item_kind"] = df["item_kind"].astype("category")
+    # Sort by Year once so the year-range filter can binary-search a contiguous slice
+    # (np.searchsorted) instead of scanning the whole Year column on every rerun.
+    df = df.sort_values(["Year","Area","Item"]).reset_index(drop=True)
+    kinds_present, items_by_kind = _ui_metadata(df)
+    return df, kinds_present, items_by_kind, _region_pools(df)
 
 # Either read from the default path or let the user upload a CSV interactively.
 path = Path(DEFAULT_PREPARED)
@@ -166,22 +253,124 @@ if not path.exists():
     df = pd.read_csv(uploaded)
     # If someone uploads a larger dataset with extra metrics, we still enforce the template scope.
     df = df[df["Metric"].isin(["Total_CO2e","Stocks"])].copy()
+    df["Metric"] = df["Metric"].astype(pd.CategoricalDtype(["Total_CO2e","Stocks"]))
+    df["_kind_norm"] = (df["item_kind"].astype(str).str.strip().str.lower()
+                                       .map(NORMALIZE_MAP).fillna("atomic").astype("category"))
+    df["_is_group_total"] = df["Area"].str.contains("group total", case=False, na=False, regex=False)
+    df["Area"] = df["Area"].astype("category")
+    df["Item"] = df["Item"].astype("category")
+    df["Value"] = pd.to_numeric(df["Value"], downcast="float")
+    df["Year"] = df["Year"].astype("int16")
+    for flag in FLAG_MAP.values():
+        df[flag] = df[flag].astype(bool)
+    df["_kind_lower"] = df["item_kind"].astype(str).str.strip().str.lower().astype("category")
+    df["item_kind"] = df["item_kind"].astype("category")
+    df = df.sort_values(["Year","Area","Item"]).reset_index(drop=True)
+    kinds_present, ITEMS_BY_KIND = _ui_metadata(df)
+    REGION_POOLS = _region_pools(df)
+    # Cache token for the per-widget caches below: a re-upload invalidates them.
+    DF_TOKEN = (uploaded.name, uploaded.size)
 else:
-    df = load_prepared(path)
+    mtime = path.stat().st_mtime
+    df, kinds_present, ITEMS_BY_KIND, REGION_POOLS = load_prepared(path, mtime)
+    DF_TOKEN = mtime
+
+# Ranked Top-N countries for a (metric, kind, region, year, item-set) combination.
+# Cached so repeat interactions (toggling view mode, revisiting a preset) reuse the
+# ranking instead of re-running the filter + groupby + sort. The frame itself is passed
+# underscore-prefixed so Streamlit does not hash it; df_token stands in for its identity.
+@st.cache_data
+def top_countries(df_token, metric: str, kind_value: str, region: str, year: int,
+                  items_tuple: tuple, _df: pd.DataFrame, n: int = 10) -> list:
+    pool = REGION_POOLS[region]
+    sub = _df[(_df["Metric"]==metric) & (_df["Year"]==year)
+              & (_df["_kind_norm"]==kind_value) & _df["Item"].isin(items_tuple)
+              & _df["Area"].isin(pool)]
+    return (sub.groupby("Area", as_index=False, observed=True, sort=False)["Value"].sum()
+               .nlargest(n, "Value")["Area"].tolist())
+
+# The frame is sorted by Year (see loader), so the per-rerun year-range filter can
+# binary-search this array for a contiguous row slice instead of scanning the column.
+year_values = df["Year"].values
+
+# Region flags packed into one C-contiguous boolean matrix aligned with df's rows
+# (df has a fresh RangeIndex after the loader sort, so row position == index label).
+# Selecting a region is then a single contiguous column AND instead of two pandas
+# Series ops with index alignment. The flags are already 1-byte bools (see loader).
+FLAGS_ARR = np.stack([df[FLAG_MAP[r]].values for r in REGION_OPTIONS], axis=1)
+NOT_GROUP_TOTAL_ARR = ~df["_is_group_total"].values
+
+# Per-region pie cube: region -> (Year x Item) matrix of summed Total_CO2e, built once
+# per dataset. The region path of the Composition tab then reduces to one indexed row
+# lookup instead of re-running a filter + groupby on every interaction.
+@st.cache_data
+def region_pie_cube(df_token, _df: pd.DataFrame) -> dict:
+    cube = _df[_df["_kind_lower"].isin(["aggregated","aggregate"])
+               & (_df["Metric"]=="Total_CO2e") & ~_df["_is_group_total"]]
+    return {r: (cube[cube[FLAG_MAP[r]]]
+                .groupby(["Year","Item"], observed=True)["Value"].sum()
+                .unstack("Item"))
+            for r in REGION_OPTIONS}
+
+# Country options for the Composition tab, built once per dataset: the full sorted
+# country list plus the set of countries actually present per year, so the per-rerun
+# list is a comprehension with hashset lookups instead of unique() + sort + str filter.
+@st.cache_data
+def pie_country_options(df_token, _df: pd.DataFrame) -> tuple[list, dict]:
+    pie_rows = _df[_df["_kind_lower"].isin(["aggregated","aggregate"])
+                   & (_df["Metric"]=="Total_CO2e") & ~_df["_is_group_total"]]
+    all_countries = [a for a in _df["Area"].cat.categories if "group total" not in a.lower()]
+    by_year = {int(y): frozenset(g["Area"].cat.remove_unused_categories().cat.categories)
+               for y, g in pie_rows.groupby("Year", observed=True)}
+    return all_countries, by_year
+
+# Chart specs are pure functions of their input frame and options. Caching the
+# serialized Vega-Lite dict means a rerun that does not change the chart inputs skips
+# rebuilding and re-serializing the Altair object entirely; frames are hashed by content.
+_SPEC_HASH = {pd.DataFrame: lambda d: pd.util.hash_pandas_object(d, index=False).values.tobytes()}
+
+@st.cache_data(hash_funcs=_SPEC_HASH)
+def build_line_chart(totals: pd.DataFrame, y_label: str, order_tuple: tuple, show_region: bool) -> dict:
+    chart = (
+        alt.Chart(totals)
+           .mark_line(point=True)
+           .encode(
+               x=alt.X("Year:O", title="Year"),
+               y=alt.Y("SeriesValue:Q", title=y_label),
+               color=alt.Color("Area:N", sort=list(order_tuple), legend=alt.Legend(title="Region" if show_region else "Country")),
+               tooltip=[
+                   alt.Tooltip("Area:N", title="Region" if show_region else "Country"),
+                   alt.Tooltip("Year:O", title="Year"),
+                   alt.Tooltip("SeriesValue:Q", title=y_label, format=",.0f"),
+               ],
+           )
+           .properties(height=520)
+    )
+    return chart.to_dict()
+
+@st.cache_data(hash_funcs=_SPEC_HASH)
+def build_pie_chart(pie_df: pd.DataFrame, title: str) -> dict:
+    pie = (
+        alt.Chart(pie_df)
+           .mark_arc(outerRadius=160)
+           .encode(
+               theta=alt.Theta(field="Value", type="quantitative", stack=True),
+               color=alt.Color(field="Item", type="nominal", scale=alt.Scale(range=ALT_CATEGORY[:12]), legend=alt.Legend(title="Aggregated group")),
+               tooltip=[
+                   alt.Tooltip("Item:N", title="Group"),
+                   alt.Tooltip("Value:Q", title="Value (kt CO₂e)", format=",.0f"),
+                   alt.Tooltip("Share:Q", title="Share", format=".1%"),
+               ],
+           )
+           .properties(width=520, height=520, title=title)
+    )
+    return pie.to_dict()
 
 # Determine the available year range from the data and set sensible defaults for sliders.
-year_min, year_max = int(df["Year"].min()), int(df["Year"].max())
+year_min, year_max = int(year_values[0]), int(year_values[-1])
 DEFAULT_START = max(1990, year_min)   # Avoid very early years by default if present
 DEFAULT_END   = min(2022, year_max)   # Cap default at 2022 to reflect typical latest year in examples
 
-# Helper to normalize free-text / variant values of item_kind to the three canonical buckets used by the UI.
-# This allows the app to accept small naming inconsistencies from upstream processors.
-def normalize_kind_value(v: str) -> str:
-    s = str(v).strip().lower()
-    if s in {"all","all animals","all_animals"}: return "All"
-    if s in {"aggregated","aggregate"}: return "aggregated"
-    return "atomic"
-
 # ---------------------------
 # 2) Tabs
 # ---------------------------
@@ -249,8 +438,7 @@ with tab_ts:
         )
 
     # --- Item grouping control (All / aggregated / atomic) ----------------------
-    # We detect which kinds exist in the data, then pick a sensible default order.
-    kinds_present = sorted({normalize_kind_value(v) for v in df["item_kind"].unique()})
+    # kinds_present was precomputed by the cached loader; pick a sensible default order.
     kind_label_to_value = {"All": "All", "Aggregated": "aggregated", "Atomic": "atomic"}
     default_kind_label = (
         "All" if "All" in kinds_present else ("Aggregated" if "aggregated" in kinds_present else "Atomic")
@@ -265,10 +453,9 @@ with tab_ts:
         )
     kind_value = kind_label_to_value[kind_label]
 
-    # Build the list of items available for the chosen kind. For kind="All" we restrict selection to one
-    # item by design (the global total), so we also constrain the defaults accordingly.
-    subset = df[df["item_kind"].apply(lambda x: normalize_kind_value(x) == kind_value)]
-    items_all = sorted(subset["Item"].dropna().unique().tolist())
+    # List of items available for the chosen kind — a dict lookup into the cached metadata.
+    # For kind="All" we restrict selection to one item by design (the global total).
+    items_all = ITEMS_BY_KIND.get(kind_value, [])
 
     # We use st.session_state to preserve multiselect choices when users tweak other controls.
     ITEMS_KEY = "items_template_multiselect"
@@ -316,23 +503,37 @@ with tab_ts:
         region_choice = st.selectbox("Region", REGION_OPTIONS, index=0, disabled=not show_region)
 
     # Prepare the base dataframe for plotting: filter metric, period, item_kind, and chosen items.
-    base = df[(df["Metric"]==metric) & (df["Year"]>=year_range[0]) & (df["Year"]<=year_range[1])]
-    base = base[base["item_kind"].apply(lambda x: normalize_kind_value(x) == kind_value)]
-    base = base[base["Item"].isin(items)]
+    # The year range becomes a binary-searched contiguous slice (frame is Year-sorted);
+    # the remaining conditions are one fused boolean mask over that much smaller slice.
+    y0, y1 = year_range
+    lo = np.searchsorted(year_values, y0, side="left")
+    hi = np.searchsorted(year_values, y1, side="right")
+    year_slice = df.iloc[lo:hi]
+    mask = ((year_slice["Metric"].values == metric)
+            & (year_slice["_kind_norm"].values == kind_value)
+            & year_slice["Item"].isin(items).values)
+    base = year_slice[mask]
     if base.empty: st.info("No data for current filters."); st.stop()
 
     if show_region:
         # Compute regional totals directly from the boolean flags in the data (e.g., region_EU==True).
-        # We also drop any legacy "(group total)" rows to avoid double-counting.
-        flag_col = FLAG_MAP[region_choice]
-        sub = base[base[flag_col] & ~base["Area"].str.contains("(group total)", case=False, na=False)].copy()
+        # We also drop any legacy "(group total)" rows to avoid double-counting. The flag and
+        # group-total tests come from the precomputed row-aligned arrays, sliced to the year window.
+        region_idx = REGION_OPTIONS.index(region_choice)
+        region_arr = FLAGS_ARR[lo:hi, region_idx] & NOT_GROUP_TOTAL_ARR[lo:hi]
+        sub = year_slice[mask & region_arr]
         if sub.empty:
             st.info(f"No countries flagged for region: {region_choice}."); st.stop()
-        totals = (
-            sub.groupby(["Year"], as_index=False)["Value"].sum()
-               .assign(Area=region_choice)[["Area","Year","Value"]]
-               .rename(columns={"Value":"SeriesValue"})
-        )
+        # Build the output frame in a single allocation straight from the groupby result:
+        # no assign/reorder/rename intermediates, and the constant Area column is stored
+        # as one-category codes instead of a repeated string.
+        per_year = sub.groupby("Year", observed=True, sort=True)["Value"].sum()
+        totals = pd.DataFrame({
+            "Area": pd.Categorical.from_codes(np.zeros(len(per_year), dtype=np.int8),
+                                              categories=[region_choice]),
+            "Year": per_year.index.to_numpy(),
+            "SeriesValue": per_year.to_numpy(),
+        })
     else:
         # Country series mode. We offer two ways to pick countries:
         #  - Preset (Top 10) from a region pool (optionally adding Switzerland), ranked by latest-year totals
@@ -342,8 +543,9 @@ with tab_ts:
             mode = st.radio("Country selection mode", ["Preset (Top 10)", "Custom (pick countries)"])
             add_ch = False
             preset_choice = None
-            available_countries = sorted(
-                base[~base["Area"].str.contains("(group total)", case=False, na=False)]["Area"].dropna().unique().tolist()
+            available_countries = (
+                base.loc[~base["_is_group_total"], "Area"]
+                    .cat.remove_unused_categories().cat.categories.tolist()
             )
             if mode == "Preset (Top 10)":
                 preset_choice = st.selectbox("Preset group", REGION_OPTIONS, index=0)
@@ -351,18 +553,17 @@ with tab_ts:
             else:
                 selected_countries = st.multiselect("Countries (max 12)", options=available_countries, max_selections=12)
 
-        sub = base.copy()
+        # No copy needed: sub is only filtered further and fed to groupby, never mutated.
+        sub = base
         if mode == "Preset (Top 10)":
-            # Build the pool of countries for the chosen region, rank by latest-year value, keep top 10.
-            flag_col = FLAG_MAP[preset_choice]
-            pool = sorted(sub.loc[sub[flag_col] & ~sub["Area"].str.contains("(group total)", case=False, na=False), "Area"].unique().tolist())
-            latest_year = sub["Year"].max()
-            latest = sub[(sub["Year"]==latest_year) & (sub["Area"].isin(pool))]
-            ranked = (
-                latest.groupby("Area", as_index=False)["Value"].sum()
-                      .sort_values("Value", ascending=False)["Area"].tolist()
-            )
-            keep = ranked[:10]
+            # Pool of countries for the chosen region (precomputed at load), ranked by
+            # latest-year value via the cached helper; keep top 10.
+            pool = REGION_POOLS[preset_choice]
+            # sub is Year-sorted (slice of the sorted frame), so its last row holds the
+            # latest in-view year — no full-column max() scan needed.
+            latest_year = int(sub["Year"].iloc[-1])
+            keep = top_countries(DF_TOKEN, metric, kind_value, preset_choice,
+                                 latest_year, tuple(sorted(items)), df)
             # A tiny UX flourish: optionally include Switzerland if it's not in the top 10 but in the region.
             if add_ch and "Switzerland" in pool and "Switzerland" not in keep:
                 keep.append("Switzerland")
@@ -371,7 +572,7 @@ with tab_ts:
 
         if keep: sub = sub[sub["Area"].isin(keep)]
         if sub.empty: st.info("No data after country selection."); st.stop()
-        totals = sub.groupby(["Area","Year"], as_index=False)["Value"].sum().rename(columns={"Value":"SeriesValue"})
+        totals = sub.groupby(["Area","Year"], as_index=False, observed=True, sort=False)["Value"].sum().rename(columns={"Value":"SeriesValue"})
 
     # --- Chart ------------------------------------------------------------------
     y_label = metric_unit_label(metric)
@@ -380,28 +581,18 @@ with tab_ts:
     st.subheader(subtitle); st.caption(f"Group: {kind_label}")
 
     # Order legend by the latest-year value so the most important lines appear first.
-    order_latest = (
-        totals[totals["Year"]==totals["Year"].max()].sort_values("SeriesValue", ascending=False)["Area"].tolist()
-    )
-    chart = (
-        alt.Chart(totals)
-           .mark_line(point=True)
-           .encode(
-               x=alt.X("Year:O", title="Year"),
-               y=alt.Y("SeriesValue:Q", title=y_label),
-               color=alt.Color("Area:N", sort=order_latest, legend=alt.Legend(title="Region" if show_region else "Country")),
-               tooltip=[
-                   alt.Tooltip("Area:N", title="Region" if show_region else "Country"),
-                   alt.Tooltip("Year:O", title="Year"),
-                   alt.Tooltip("SeriesValue:Q", title=y_label, format=",.0f"),
-               ],
-           )
-           .properties(height=520)
-    )
-    st.altair_chart(chart, use_container_width=True)
+    # The slider's upper bound already tells us the latest year in view, so no max()
+    # rescan of totals; fall back to the actual max only if that year has no rows.
+    # nlargest does a heap-based partial sort over the handful of latest-year rows.
+    latest_rows = totals[totals["Year"] == min(y1, year_max)]
+    if latest_rows.empty:
+        latest_rows = totals[totals["Year"] == totals["Year"].max()]
+    order_latest = latest_rows.nlargest(len(latest_rows), "SeriesValue")["Area"].tolist()
+    line_spec = build_line_chart(totals, y_label, tuple(order_latest), show_region)
+    st.vega_lite_chart(line_spec, use_container_width=True)
 
     # Let users export the aggregated time series powering the chart.
-    csv_bytes = totals.to_csv(index=False).encode("utf-8")
+    csv_bytes = df_to_csv_bytes(totals)
     fname = f"timeseries_{metric}_{kind_value}_{year_range[0]}_{year_range[1]}"
     fname += f"_{region_choice}_REGION.csv" if show_region else ".csv"
     st.download_button("Download series as CSV", data=csv_bytes, file_name=fname, mime="text/csv")
@@ -442,27 +633,31 @@ with tab_pie:
     year_pie = st.slider("Pie year", min_value=year_min, max_value=year_max, value=min(2022, year_max), step=1)
 
     # Only use the 'aggregated' item_kind (domain-specific groups like Cattle / Poultry / etc.).
-    agg = df[(df["item_kind"].apply(lambda x: str(x).strip().lower() in {"aggregated","aggregate"})) &
-             (df["Metric"]==metric_pie) & (df["Year"]==year_pie)].copy()
+    agg = df[df["_kind_lower"].isin(["aggregated","aggregate"]) &
+             (df["Metric"]==metric_pie) & (df["Year"]==year_pie)]
     if agg.empty:
         st.info("No aggregated rows found for that year."); st.stop()
 
     # Build the selection list: first show computed regions, then countries from the data (exclude any
-    # legacy pre-aggregated 'group total' rows to avoid double-counting).
-    areas = sorted(agg["Area"].dropna().unique().tolist())
-    countries = [a for a in areas if "group total" not in str(a).lower()]
+    # legacy pre-aggregated 'group total' rows to avoid double-counting). Both pieces are
+    # precomputed; filtering to the chosen year is a hashset membership test.
+    all_countries, countries_by_year = pie_country_options(DF_TOKEN, df)
+    year_present = countries_by_year.get(int(year_pie), frozenset())
+    countries = [c for c in all_countries if c in year_present]
     area_choice = st.selectbox("Choose country or region", REGION_OPTIONS + countries, index=0)
 
-    # Compute the pie slice values either by summing flagged countries for a region or by picking a single country.
+    # Compute the pie slice values either from the precomputed per-region cube (a single
+    # row lookup) or by summing the rows of a single country.
     if area_choice in REGION_OPTIONS:
-        flag_col = FLAG_MAP[area_choice]
-        pie_df = (
-            agg[agg[flag_col] & ~agg["Area"].str.contains("(group total)", case=False, na=False)][["Item","Value"]]
-               .groupby("Item", as_index=False)["Value"].sum()
-        )
+        year_by_item = region_pie_cube(DF_TOKEN, df)[area_choice]
+        if year_pie in year_by_item.index:
+            pie_df = (year_by_item.loc[year_pie].dropna()
+                                  .rename("Value").rename_axis("Item").reset_index())
+        else:
+            pie_df = pd.DataFrame(columns=["Item","Value"])
         title_area = area_choice
     else:
-        pie_df = agg[agg["Area"]==area_choice][["Item","Value"]].groupby("Item", as_index=False)["Value"].sum()
+        pie_df = agg[agg["Area"]==area_choice][["Item","Value"]].groupby("Item", as_index=False, observed=True, sort=False)["Value"].sum()
         title_area = area_choice
 
     # Validate we have something positive to plot; avoid division by zero.
@@ -477,29 +672,16 @@ with tab_pie:
     pie_df_display = pie_df_display.rename(columns={"Value": "Value (kt CO₂e)"})
     pie_df_display["Value (kt CO₂e)"] = pie_df_display["Value (kt CO₂e)"].round(0)
 
-    # Altair pie chart. We intentionally set a fixed outerRadius for consistent sizing.
-    pie = (
-        alt.Chart(pie_df)
-           .mark_arc(outerRadius=160)
-           .encode(
-               theta=alt.Theta(field="Value", type="quantitative", stack=True),
-               color=alt.Color(field="Item", type="nominal", scale=alt.Scale(range=ALT_CATEGORY[:12]), legend=alt.Legend(title="Aggregated group")),
-               tooltip=[
-                   alt.Tooltip("Item:N", title="Group"),
-                   alt.Tooltip("Value:Q", title="Value (kt CO₂e)", format=",.0f"),
-                   alt.Tooltip("Share:Q", title="Share", format=".1%"),
-               ],
-           )
-           .properties(width=520, height=520, title=f"{metric_unit_label(metric_pie)} — {title_area} — {year_pie}")
-    )
-    st.altair_chart(pie, use_container_width=False)
+    # Altair pie chart (cached spec). We intentionally set a fixed outerRadius for consistent sizing.
+    pie_spec = build_pie_chart(pie_df, f"{metric_unit_label(metric_pie)} — {title_area} — {year_pie}")
+    st.vega_lite_chart(pie_spec, use_container_width=False)
 
     # Show and allow download of the table behind the pie for transparency and reuse.
     st.write("Data behind the pie:")
     st.dataframe(pie_df_display, use_container_width=True)
     st.download_button(
         "Download pie data as CSV",
-        data=pie_df_display.to_csv(index=False).encode("utf-8"),
+        data=df_to_csv_bytes(pie_df_display),
         file_name=f"pie_{metric_pie}_{title_area.replace(' ','_')}_{year_pie}.csv",
         mime="text/csv",
     )
@@ -533,44 +715,71 @@ with tab_map:
     year_map = st.slider("Map year", min_value=year_min, max_value=year_max, value=min(2022, year_max), step=1)
     metric_map = "Total_CO2e"
 
+    # Lazy import, resolved once per session: the first visit to this tab pays the Plotly
+    # import; later reruns fetch the module object straight from session_state.
+    if "_px" not in st.session_state:
+        try:
+            import plotly.express as px_mod
+        except Exception:
+            px_mod = None
+        st.session_state["_px"] = px_mod
+    px = st.session_state["_px"]
+
     # If Plotly isn't installed, we show a clear, actionable message and stop just this tab's logic.
-    if not HAS_PLOTLY:
+    if px is None:
         st.error("Plotly is not installed. In a terminal, run:\n\n  py -m pip install plotly\n\nThen rerun the app.")
         st.stop()
 
     # The map only uses the 'All' item-kind to avoid double-counting. We also drop any '(group total)'
     # rows and restrict to countries flagged as European based on the region_europe boolean.
-    sub_all = df[df["item_kind"].apply(lambda v: str(v).strip().lower() in {"all","all animals","all_animals"})]
-    sub = sub_all[(sub_all["Metric"]==metric_map) & (sub_all["Year"]==year_map)].copy()
-    sub = sub[~sub["Area"].str.contains("(group total)", case=False, na=False)].copy()
+    sub_all = df[df["_kind_lower"].isin(["all","all animals","all_animals"])]
+    sub = sub_all[(sub_all["Metric"]==metric_map) & (sub_all["Year"]==year_map)]
+    sub = sub[~sub["_is_group_total"]]
 
-    # Keep only countries flagged as Europe (computed via boolean in the data)
-    sub = sub[sub["region_europe"]==True]
+    # Keep only countries flagged as Europe: gather from the row-aligned flag matrix
+    # (sub still carries df's RangeIndex labels, which equal row positions).
+    sub = sub[FLAGS_ARR[sub.index.to_numpy(), REGION_OPTIONS.index("Europe")]]
 
-    map_df = sub.groupby(["Area"], as_index=False)["Value"].sum()
+    map_df = sub.groupby(["Area"], as_index=False, observed=True, sort=False)["Value"].sum()
 
     # Normalize some country names to match Plotly's expectations (tune for your domain if needed).
+    # Area is categorical, so we rename the tiny category index instead of scanning every
+    # row with replace(). Only apply renames that exist and would not collide with an
+    # existing category (the FAO export already uses the long names).
     name_fix = {"UK": "United Kingdom", "Russia": "Russian Federation"}
-    map_df["Area"] = map_df["Area"].replace(name_fix)
+    cats = map_df["Area"].cat.categories
+    applicable = {old: new for old, new in name_fix.items() if old in cats and new not in cats}
+    if applicable:
+        map_df["Area"] = map_df["Area"].cat.rename_categories(applicable)
 
     label = "Total (kt CO₂e)"
-    fig = px.choropleth(
-        map_df,
-        locations="Area",
-        locationmode="country names",
-        color="Value",
-        scope="europe",
-        color_continuous_scale=CORP_SCALE,
-        labels={"Value": label, "Area": "Country"},
-        title=f"{label} — Europe — {year_map}",
-    )
-    # Set margins and apply the same background/text colors for a cohesive look.
-    fig.update_layout(
-        margin=dict(l=10,r=10,t=50,b=10),
-        paper_bgcolor=CORP["bg"],
-        plot_bgcolor=CORP["panel"],
-        font_color=CORP["text"],
-    )
+    # Build the choropleth once per session and afterwards only swap its data arrays:
+    # re-creating the figure re-serializes the full layout and geometry on every slider
+    # tick, while update_traces just replaces z/locations.
+    fig = st.session_state.get("_map_fig")
+    if fig is None:
+        fig = px.choropleth(
+            map_df,
+            locations="Area",
+            locationmode="country names",
+            color="Value",
+            scope="europe",
+            color_continuous_scale=CORP_SCALE,
+            labels={"Value": label, "Area": "Country"},
+            title=f"{label} — Europe — {year_map}",
+        )
+        # Set margins and apply the same background/text colors for a cohesive look.
+        fig.update_layout(
+            margin=dict(l=10,r=10,t=50,b=10),
+            paper_bgcolor=CORP["bg"],
+            plot_bgcolor=CORP["panel"],
+            font_color=CORP["text"],
+        )
+        st.session_state["_map_fig"] = fig
+    else:
+        fig.update_traces(locations=map_df["Area"].astype(str).tolist(),
+                          z=map_df["Value"].to_numpy())
+        fig.update_layout(title_text=f"{label} — Europe — {year_map}")
     st.plotly_chart(fig, use_container_width=True)
 
     # Expose the mapped values and let users download them.
@@ -580,7 +789,7 @@ with tab_map:
     st.dataframe(map_df_display.sort_values("Value (kt CO₂e)", ascending=False), use_container_width=True)
     st.download_button(
         "Download map data as CSV",
-        data=map_df_display.to_csv(index=False).encode("utf-8"),
+        data=df_to_csv_bytes(map_df_display),
         file_name=f"map_Total_CO2e_{year_map}.csv",
         mime="text/csv",
     )